@@ -7,9 +7,9 @@ from PIL import Image
 import yaml
 from utils.video_utils import read_video, save_video
 from trackers.tracker import Tracker
-from team_assigner.team_assigner import TeamAssigner
-from player_ball_assigner.player_ball_assigner import PlayerBallAssigner
 from camera_movement_estimator.camera_movement_estimator import CameraMovementEstimator
+from pipeline_scheduler.pipeline_scheduler import PipelineScheduler, Stage
+from pipeline_scheduler.football_stages import get_football_stages
 import pandas as pd
 
 st.set_page_config(page_title="Football Analysis Tool", page_icon="⚽", layout="centered", initial_sidebar_state="expanded")
@@ -21,47 +21,25 @@ page = st.sidebar.selectbox("Choose a page", ["Home", "Video Analysis", "About",
 def process_video(video_path):
     video_frames = read_video(video_path)
     tracker = Tracker('training/runs/detect/train/weights/best.pt')
-    tracks = tracker.get_object_tracks(video_frames, read_from_stubs=False)
-    tracker.add_position_to_tracks(tracks)
-    
     camera_movement_estimator = CameraMovementEstimator(video_frames[0])
-    camera_movement_per_frame = camera_movement_estimator.get_camera_movement(video_frames, read_from_stubs=False)
-    camera_movement_estimator.adjust_positions_to_tracks(tracks, camera_movement_per_frame)
-    tracks['ball'] = tracker.interpolate_ball_positions(tracks['ball'])
-    
-    team_assigner = TeamAssigner()
-    team_assigner.assign_team_color(frame=video_frames[0], player_detections=tracks['players'][0])
-    
-    for frame_num, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(video_frames[frame_num], track["bbox"], player_id)
-            tracks['players'][frame_num][player_id]['team'] = team
-            tracks['players'][frame_num][player_id]['team_color'] = team_assigner.team_colors[team]
-    
-    player_assigner = PlayerBallAssigner()
-    team_ball_control = []
-    for frame_num, player_track in enumerate(tracks['players']):
-        ball_bbox = tracks['ball'][frame_num][1]['bbox']
-        assigned_player = player_assigner.assign_ball_to_player(player_track, ball_bbox)
-        if assigned_player != -1:
-            tracks['players'][frame_num][assigned_player]['has_ball'] = True
-            team_ball_control.append(tracks['players'][frame_num][assigned_player]['team'])
-        else:
-            team_ball_control.append(team_ball_control[-1] if team_ball_control else None)
-    
-    team_ball_control = np.array(team_ball_control)
-    output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
-    output_video_frames = camera_movement_estimator.draw_camera_movements(output_video_frames, camera_movement_per_frame)
-    
-    temp_avi = tempfile.NamedTemporaryFile(delete=False, suffix=".avi")
-    save_video(output_video_frames, temp_avi.name)
-    
-    temp_mp4 = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    mp4_path = temp_mp4.name
-    
-    os.system(f'ffmpeg -i "{temp_avi.name}" -c:v libx264 -preset slow -crf 18 -c:a aac -b:a 192k "{mp4_path}" -y')
+
+    def encode(output_video_frames):
+        temp_avi = tempfile.NamedTemporaryFile(delete=False, suffix=".avi")
+        save_video(output_video_frames, temp_avi.name)
+        
+        temp_mp4 = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
+        mp4_path = temp_mp4.name
+        
+        os.system(f'ffmpeg -i "{temp_avi.name}" -c:v libx264 -preset slow -crf 18 -c:a aac -b:a 192k "{mp4_path}" -y')
+        return mp4_path
+
+    stages = get_football_stages(tracker, camera_movement_estimator, read_from_stubs=False)
+    stages.append(Stage("encode", encode, inputs=["output_video_frames"], outputs=["mp4_path"]))
+
+    scheduler = PipelineScheduler(stages)
+    artifacts = scheduler.run(video_frames=video_frames)
     
-    return mp4_path
+    return artifacts['mp4_path'], artifacts['possession_timeline'], artifacts['team_compactness'], artifacts['ball_carrier_pressure'], scheduler.get_timing_report()
 
 # Page: Home
 if page == "Home":
@@ -88,11 +66,28 @@ elif page == "Video Analysis":
 
         if st.button("Process Video"):
             with st.spinner("Processing Video... This may take a while."):
-                processed_video_path = process_video(temp_file.name)
+                processed_video_path, possession_timeline, team_compactness, ball_carrier_pressure, timing_report = process_video(temp_file.name)
 
             st.success("Processing complete! ✅")
             st.video(processed_video_path)
 
+            st.subheader("Possession Summary")
+            st.dataframe(pd.DataFrame(possession_timeline.get_summary()))
+
+            with st.expander("📋 View passes and interceptions"):
+                st.dataframe(pd.DataFrame(possession_timeline.get_events()))
+
+            st.subheader("Team Compactness")
+            st.line_chart(pd.DataFrame(team_compactness).rename(columns={1: "Team 1", 2: "Team 2"}))
+
+            st.subheader("Ball Carrier Pressure")
+            ball_carrier_pressure = pd.Series(ball_carrier_pressure, dtype=float, name="Opponents within radius")
+            st.metric("Average opponents near the ball carrier", f"{ball_carrier_pressure.mean():.2f}" if ball_carrier_pressure.notna().any() else "-")
+            st.line_chart(ball_carrier_pressure)
+
+            with st.expander("⏱️ View pipeline timings"):
+                st.text(timing_report)
+
             with open(processed_video_path, "rb") as file:
                 st.download_button("⬇️ Download Processed Video", file, file_name="processed_video.mp4", mime="video/mp4")
 
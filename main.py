@@ -1,63 +1,54 @@
+import argparse
 from utils.video_utils import read_video, save_video
 from trackers.tracker import Tracker
-from team_assigner.team_assigner import TeamAssigner
-from player_ball_assigner.player_ball_assigner import PlayerBallAssigner
 import cv2
-import numpy as np
 from camera_movement_estimator.camera_movement_estimator import CameraMovementEstimator
+from video_sharder.video_sharder import VideoSharder
+from pipeline_scheduler.pipeline_scheduler import PipelineScheduler, Stage
+from pipeline_scheduler.football_stages import get_football_stages
 
-def main():
-    video_frames = read_video("input_videos/input_video_2.mp4")
+def main(num_workers=1):
+    video_path = "input_videos/input_video_2.mp4"
+    model_path = 'training/runs/detect/train/weights/best.pt'
 
-    tracker = Tracker('training/runs/detect/train/weights/best.pt')
+    video_frames = read_video(video_path)
 
-    tracks = tracker.get_object_tracks(video_frames, 
-                                       read_from_stubs=True, 
-                                       stubs_path="stubs/track_stubs_2.pkl")
-    
-    tracker.add_position_to_tracks(tracks)
-    
-    ## Camera Movement Estimation
+    tracker = Tracker(model_path)
     camera_movement_estimator = CameraMovementEstimator(video_frames[0])
-    camera_movement_per_frame = camera_movement_estimator.get_camera_movement(video_frames,
-                                                                              read_from_stubs=True,
-                                                                              stubs_path="stubs/camera_movement_stubs_2.pkl")
-    
-    camera_movement_estimator.adjust_positions_to_tracks(tracks, camera_movement_per_frame)
-    
-    ## Interpolate ball positions
-    tracks['ball'] = tracker.interpolate_ball_positions(tracks["ball"])
-
-
-    ## Assign team
-    team_assigner = TeamAssigner()
-    team_assigner.assign_team_color(frame=video_frames[0], player_detections=tracks['players'][0])
-
-    for frame_num, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(video_frames[frame_num], track["bbox"], player_id)
-
-            tracks['players'][frame_num][player_id]["team"] = team
-            tracks['players'][frame_num][player_id]["team_color"] = team_assigner.team_colors[team]
-
-    ## Assign ball to player
-    player_assigner = PlayerBallAssigner()
-    team_ball_control = []
-    for frame_num, player_track in enumerate(tracks['players']):
-        ball_bbox = tracks['ball'][frame_num][1]["bbox"]
-        assigned_player = player_assigner.assign_ball_to_player(player_track, ball_bbox)
-
-        if assigned_player != -1:
-            tracks['players'][frame_num][assigned_player]['has_ball'] = True
-            team_ball_control.append(tracks['players'][frame_num][assigned_player]['team'])
-        else:
-            team_ball_control.append(team_ball_control[-1])
-        
-    team_ball_control = np.array(team_ball_control)
 
+    stages = get_football_stages(tracker,
+                                 camera_movement_estimator,
+                                 read_from_stubs=True,
+                                 track_stubs_path="stubs/track_stubs_2.pkl",
+                                 camera_movement_stubs_path="stubs/camera_movement_stubs_2.pkl")
+
+    if num_workers > 1:
+        ## Track and estimate camera movement per segment on separate workers
+        video_sharder = VideoSharder(model_path, shared_dir="stubs/shards_2")
+        stages = [stage for stage in stages if stage.name not in ("detection", "tracking", "camera_movement")]
+        stages.append(Stage("sharded_tracking",
+                            lambda: video_sharder.process_video(video_path, num_workers=num_workers, num_frames=len(video_frames)),
+                            inputs=[],
+                            outputs=["raw_tracks", "camera_movement_per_frame"]))
+
+    stages.append(Stage("encode",
+                        lambda output_video_frames: save_video(output_video_frames, "output_videos/output_video_2.avi"),
+                        inputs=["output_video_frames"],
+                        outputs=[]))
+
+    scheduler = PipelineScheduler(stages)
+    artifacts = scheduler.run(video_frames=video_frames)
+    print(scheduler.get_timing_report())
+
+    ## Opponents within the pressure radius of the ball carrier, over frames where someone has the ball
+    ball_carrier_pressure = [pressure for pressure in artifacts['ball_carrier_pressure'] if pressure is not None]
+    if ball_carrier_pressure:
+        print(f"Ball carrier pressure: {sum(ball_carrier_pressure) / len(ball_carrier_pressure):.2f} opponents on average, "
+              f"{sum(pressure > 0 for pressure in ball_carrier_pressure) / len(ball_carrier_pressure) * 100:.2f} % of frames under pressure")
 
     """
     ## save croppped image of a player
+    tracks = artifacts['tracks']
     for track_id, player in tracks['players'][10].items():
         frame = video_frames[10]
         bbox = player["bbox"]
@@ -67,19 +58,10 @@ def main():
         break
     """
 
-    ## Draw Annotations
-    output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
-
-    """    
-    if not output_video_frames or output_video_frames[0] is None:
-        print("Error: No valid frames generated after annotation.")
-        return
-    """
-
-    ## Draw Camera Movement
-    output_video_frames = camera_movement_estimator.draw_camera_movements(output_video_frames, camera_movement_per_frame)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1, help="track the video in overlapping segments on this many workers")
+    args = parser.parse_args()
 
-    save_video(output_video_frames, "output_videos/output_video_2.avi")
+    main(num_workers=args.workers)
 
-if __name__ == "__main__":
-    main()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import os
+from team_assigner.team_assigner import TeamAssigner
+from player_ball_assigner.player_ball_assigner import PlayerBallAssigner
+from possession_timeline.possession_timeline import PossessionTimeline
+from proximity_analyzer.proximity_analyzer import ProximityAnalyzer
+from pipeline_scheduler.pipeline_scheduler import Stage
+
+def get_football_stages(tracker, camera_movement_estimator, read_from_stubs=False, track_stubs_path=None, camera_movement_stubs_path=None):
+
+    def detect(video_frames):
+        ## Tracking reads its stub instead, so there is nothing to detect
+        if read_from_stubs and track_stubs_path is not None and os.path.exists(track_stubs_path):
+            return None
+        return tracker.detect_frames(video_frames)
+
+    def track(video_frames, detections):
+        return tracker.get_object_tracks(video_frames,
+                                         read_from_stubs=read_from_stubs,
+                                         stubs_path=track_stubs_path,
+                                         detections=detections)
+
+    def estimate_camera_movement(video_frames):
+        return camera_movement_estimator.get_camera_movement(video_frames,
+                                                             read_from_stubs=read_from_stubs,
+                                                             stubs_path=camera_movement_stubs_path)
+
+    ## Interpolation and team read raw_tracks concurrently, so positions go onto copies of the track dicts
+    def add_positions(raw_tracks, camera_movement_per_frame):
+        positioned_tracks = {
+            object: [{track_id: dict(track) for track_id, track in frame_tracks.items()} for frame_tracks in object_tracks]
+            for object, object_tracks in raw_tracks.items()
+        }
+        tracker.add_position_to_tracks(positioned_tracks)
+        camera_movement_estimator.adjust_positions_to_tracks(positioned_tracks, camera_movement_per_frame)
+        return positioned_tracks
+
+    def interpolate(raw_tracks):
+        return tracker.interpolate_ball_positions(raw_tracks['ball'])
+
+    def assign_teams(video_frames, raw_tracks):
+        team_assigner = TeamAssigner()
+        team_assigner.assign_team_color(frame=video_frames[0], player_detections=raw_tracks['players'][0])
+
+        for frame_num, player_track in enumerate(raw_tracks['players']):
+            for player_id, track in player_track.items():
+                team_assigner.get_player_team(video_frames[frame_num], track["bbox"], player_id)
+
+        return team_assigner
+
+    ## positioned_tracks has no other consumer, so possession fills it in and hands it on as tracks
+    def assign_possession(positioned_tracks, interpolated_ball, team_assigner):
+        tracks = positioned_tracks
+        tracks['ball'] = interpolated_ball
+
+        for frame_num, player_track in enumerate(tracks['players']):
+            for player_id in player_track:
+                team = team_assigner.player_team_dict[player_id]
+                tracks['players'][frame_num][player_id]["team"] = team
+                tracks['players'][frame_num][player_id]["team_color"] = team_assigner.team_colors[team]
+
+        player_assigner = PlayerBallAssigner()
+        ball_holders = []
+        for frame_num, player_track in enumerate(tracks['players']):
+            ball_bbox = tracks['ball'][frame_num][1]["bbox"]
+            assigned_player = player_assigner.assign_ball_to_player(player_track, ball_bbox)
+
+            if assigned_player != -1:
+                tracks['players'][frame_num][assigned_player]['has_ball'] = True
+            ball_holders.append(assigned_player)
+
+        return tracks, PossessionTimeline(ball_holders, tracks['players'])
+
+    ## Proximity comes out as its own per-frame records and is merged into copies of the tracks for render
+    def analyze_proximity(tracks):
+        return ProximityAnalyzer().get_proximity(tracks)
+
+    def attach_proximity(tracks, player_proximity):
+        return ProximityAnalyzer().add_proximity_to_tracks(tracks, player_proximity)
+
+    def render(video_frames, analyzed_tracks, possession_timeline, camera_movement_per_frame):
+        output_video_frames = tracker.draw_annotations(video_frames, analyzed_tracks, possession_timeline)
+        return camera_movement_estimator.draw_camera_movements(output_video_frames, camera_movement_per_frame)
+
+    return [
+        Stage("detection", detect, inputs=["video_frames"], outputs=["detections"]),
+        Stage("tracking", track, inputs=["video_frames", "detections"], outputs=["raw_tracks"]),
+        Stage("camera_movement", estimate_camera_movement, inputs=["video_frames"], outputs=["camera_movement_per_frame"]),
+        Stage("positions", add_positions, inputs=["raw_tracks", "camera_movement_per_frame"], outputs=["positioned_tracks"]),
+        Stage("interpolation", interpolate, inputs=["raw_tracks"], outputs=["interpolated_ball"]),
+        Stage("team", assign_teams, inputs=["video_frames", "raw_tracks"], outputs=["team_assigner"]),
+        Stage("possession", assign_possession, inputs=["positioned_tracks", "interpolated_ball", "team_assigner"], outputs=["tracks", "possession_timeline"]),
+        Stage("proximity", analyze_proximity, inputs=["tracks"], outputs=["player_proximity", "team_compactness", "ball_carrier_pressure"]),
+        Stage("attach_proximity", attach_proximity, inputs=["tracks", "player_proximity"], outputs=["analyzed_tracks"]),
+        Stage("render", render, inputs=["video_frames", "analyzed_tracks", "possession_timeline", "camera_movement_per_frame"], outputs=["output_video_frames"]),
+    ]
@@ -0,0 +1,110 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+def run_stage(function, args):
+    started = time.time()
+    result = function(*args)
+    return result, started, time.time()
+
+
+class Stage:
+    def __init__(self, name, function, inputs, outputs):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+## Runs every stage on a thread pool as soon as all of its inputs exist, so independent stages overlap.
+## A stage may only modify an input that no other stage reads, since readers may run at the same time.
+class PipelineScheduler:
+    def __init__(self, stages, max_workers=4):
+        self.stages = list(stages)
+        self.max_workers = max_workers
+        self.timings = {}
+
+        self.producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"'{output}' is produced by both '{self.producers[output]}' and '{stage.name}'")
+                self.producers[output] = stage.name
+
+    def run(self, **artifacts):
+        artifacts = dict(artifacts)
+        pending = list(self.stages)
+        running = {}
+        self.timings = {}
+        self.run_started = time.time()
+
+        thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            while pending or running:
+                for stage in [stage for stage in pending if all(name in artifacts for name in stage.inputs)]:
+                    pending.remove(stage)
+                    future = thread_pool.submit(run_stage, stage.function, [artifacts[name] for name in stage.inputs])
+                    running[future] = stage
+
+                if not running:
+                    missing = {stage.name: [name for name in stage.inputs if name not in artifacts] for stage in pending}
+                    raise RuntimeError(f"Stages can never run, missing inputs: {missing}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    result, started, finished = future.result()
+                    self.timings[stage.name] = (started - self.run_started, finished - self.run_started)
+
+                    ## A single output is the whole result, several come back as a tuple, none ignores it
+                    if len(stage.outputs) == 1:
+                        result = (result,)
+                    elif len(stage.outputs) == 0:
+                        result = ()
+                    elif not isinstance(result, (tuple, list)) or len(result) != len(stage.outputs):
+                        raise RuntimeError(f"Stage '{stage.name}' must return {len(stage.outputs)} values for {stage.outputs}")
+
+                    for name, value in zip(stage.outputs, result):
+                        artifacts[name] = value
+        finally:
+            for future in running:
+                future.cancel()
+            thread_pool.shutdown(wait=True)
+
+        self.run_finished = time.time()
+        return artifacts
+
+    def get_critical_path(self):
+        ## Longest chain of dependent stages by duration, walked in order of completion
+        path_durations = {}
+        path_parents = {}
+        for stage in sorted(self.stages, key=lambda stage: self.timings[stage.name][1]):
+            started, finished = self.timings[stage.name]
+            parents = [self.producers[name] for name in stage.inputs if name in self.producers]
+
+            parent = max(parents, key=lambda name: path_durations[name], default=None)
+            path_durations[stage.name] = finished - started + (path_durations[parent] if parent else 0)
+            path_parents[stage.name] = parent
+
+        stage_name = max(path_durations, key=path_durations.get, default=None)
+        critical_path = []
+        while stage_name is not None:
+            critical_path.insert(0, stage_name)
+            stage_name = path_parents[stage_name]
+
+        return critical_path, path_durations[critical_path[-1]] if critical_path else 0.0
+
+    def get_timing_report(self):
+        critical_path, critical_duration = self.get_critical_path()
+        total_duration = self.run_finished - self.run_started
+        stage_duration = sum(finished - started for started, finished in self.timings.values())
+
+        lines = [f"{'Stage':<20}{'Start (s)':>12}{'Duration (s)':>15}"]
+        for stage in sorted(self.stages, key=lambda stage: self.timings[stage.name][0]):
+            started, finished = self.timings[stage.name]
+            marker = " *" if stage.name in critical_path else ""
+            lines.append(f"{stage.name:<20}{started:>12.2f}{finished - started:>15.2f}{marker}")
+
+        lines.append(f"Wall time: {total_duration:.2f} s, sum of stage times: {stage_duration:.2f} s")
+        lines.append(f"Critical path ({critical_duration:.2f} s): {' -> '.join(critical_path)}")
+        return "\n".join(lines)
@@ -0,0 +1,222 @@
+import numpy as np ##type: ignore
+
+## Run-length encoded spells (start, end, holder) answering interval queries in O(log n)
+class SpellIndex:
+    def __init__(self, starts, ends, holders):
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        self.holders = list(holders)
+        self.lengths = self.ends - self.starts
+        self.length_prefix = np.concatenate([[0], np.cumsum(self.lengths)])
+
+        ## Sparse table of argmax indices for longest-spell range queries
+        self.sparse_table = [np.arange(len(self.lengths))]
+        width = 2
+        while width <= len(self.lengths):
+            previous = self.sparse_table[-1]
+            left = previous[:len(self.lengths) - width + 1]
+            right = previous[width // 2:width // 2 + len(left)]
+            self.sparse_table.append(np.where(self.lengths[left] >= self.lengths[right], left, right))
+            width *= 2
+
+    def get_spell_range(self, start, end):
+        first = int(np.searchsorted(self.ends, start, side='right'))
+        last = int(np.searchsorted(self.starts, end, side='left'))
+        return first, last
+
+    def get_clipped_length(self, spell, start, end):
+        return int(min(self.ends[spell], end) - max(self.starts[spell], start))
+
+    def count_spells(self, start, end):
+        first, last = self.get_spell_range(start, end)
+        return max(last - first, 0)
+
+    def get_total_length(self, start, end):
+        first, last = self.get_spell_range(start, end)
+        if first >= last:
+            return 0
+
+        total = int(self.length_prefix[last] - self.length_prefix[first])
+        total -= max(0, start - int(self.starts[first]))
+        total -= max(0, int(self.ends[last - 1]) - end)
+        return total
+
+    def get_longest_spell(self, start, end):
+        first, last = self.get_spell_range(start, end)
+        if first >= last:
+            return None, 0
+
+        ## Only the boundary spells can be cut by the interval
+        candidates = [first, last - 1]
+        if last - first > 2:
+            level = (last - first - 2).bit_length() - 1
+            candidates.append(int(self.sparse_table[level][first + 1]))
+            candidates.append(int(self.sparse_table[level][last - 1 - (1 << level)]))
+
+        best = max(candidates, key=lambda spell: self.get_clipped_length(spell, start, end))
+        return self.holders[best], self.get_clipped_length(best, start, end)
+
+
+## Possession spells and events derived from the per-frame PlayerBallAssigner output.
+## All queries take a half-open frame interval [start, end).
+class PossessionTimeline:
+    def __init__(self, ball_holders, player_tracks, min_spell_length=5):
+        self.num_frames = len(ball_holders)
+        self.min_spell_length = min_spell_length
+        self.teams = [1, 2]
+        self.event_types = ["pass", "interception"]
+
+        ## Run-length encode the holder of every frame, -1 meaning nobody has the ball
+        raw_spells = []
+        for frame_num, player_id in enumerate(ball_holders):
+            if raw_spells and raw_spells[-1]["player_id"] == player_id:
+                raw_spells[-1]["end"] = frame_num + 1
+                continue
+
+            team = None
+            if player_id != -1:
+                team = player_tracks[frame_num][player_id].get("team")
+            raw_spells.append({"start": frame_num, "end": frame_num + 1, "player_id": player_id, "team": team})
+
+        ## The assigner flickers between nearby players, so spells shorter than min_spell_length
+        ## are folded into the spell before them; a short opening spell counts as nobody holding the ball
+        spells = []
+        for spell in raw_spells:
+            if spell["end"] - spell["start"] < self.min_spell_length:
+                if spells:
+                    spells[-1]["end"] = spell["end"]
+                    continue
+                spell = {"start": spell["start"], "end": spell["end"], "player_id": -1, "team": None}
+
+            if spells and spells[-1]["player_id"] == spell["player_id"]:
+                spells[-1]["end"] = spell["end"]
+            else:
+                spells.append(dict(spell))
+
+        self.spells = [spell for spell in spells if spell["player_id"] != -1]
+        self.ball_lost_spells = [spell for spell in spells if spell["player_id"] == -1]
+
+        ## A change of holder is a pass within a team and an interception across teams
+        self.events = []
+        for previous, spell in zip(self.spells, self.spells[1:]):
+            if previous["player_id"] == spell["player_id"]:
+                continue
+            self.events.append({
+                "frame": spell["start"],
+                "type": "pass" if previous["team"] == spell["team"] else "interception",
+                "from_player": previous["player_id"],
+                "to_player": spell["player_id"],
+                "team": spell["team"],
+            })
+
+        ## The team of the last holder keeps control until someone else takes the ball
+        team_ball_control = np.zeros(self.num_frames, dtype=np.int64)
+        for spell, next_spell in zip(self.spells, self.spells[1:] + [None]):
+            control_end = next_spell["start"] if next_spell is not None else self.num_frames
+            team_ball_control[spell["start"]:control_end] = spell["team"] or 0
+        self.team_ball_control = team_ball_control
+
+        self.team_control_prefix = {
+            team: np.concatenate([[0], np.cumsum(team_ball_control == team)]) for team in self.teams
+        }
+
+        self.spell_index = self.build_spell_index(self.spells)
+        self.ball_lost_index = self.build_spell_index(self.ball_lost_spells)
+        self.team_spell_indexes = {
+            team: self.build_spell_index([spell for spell in self.spells if spell["team"] == team])
+            for team in self.teams
+        }
+
+        player_spells = {}
+        for spell in self.spells:
+            player_spells.setdefault(spell["player_id"], []).append(spell)
+        self.player_spell_indexes = {
+            player_id: self.build_spell_index(spells) for player_id, spells in player_spells.items()
+        }
+
+        self.event_frames = {}
+        for event_type in self.event_types:
+            for team in [None] + self.teams:
+                self.event_frames[(event_type, team)] = np.array(
+                    [event["frame"] for event in self.events
+                     if event["type"] == event_type and (team is None or event["team"] == team)],
+                    dtype=np.int64,
+                )
+        self.all_event_frames = np.array([event["frame"] for event in self.events], dtype=np.int64)
+
+    def build_spell_index(self, spells):
+        return SpellIndex([spell["start"] for spell in spells],
+                          [spell["end"] for spell in spells],
+                          [spell["player_id"] for spell in spells])
+
+    def clip_interval(self, start, end):
+        if end is None:
+            end = self.num_frames
+        return max(start, 0), min(end, self.num_frames)
+
+    def get_team_possession_frames(self, team, start=0, end=None):
+        start, end = self.clip_interval(start, end)
+        if start >= end or team not in self.team_control_prefix:
+            return 0
+        prefix = self.team_control_prefix[team]
+        return int(prefix[end] - prefix[start])
+
+    def get_possession_share(self, start=0, end=None):
+        team_frames = {team: self.get_team_possession_frames(team, start, end) for team in self.teams}
+        total_frames = sum(team_frames.values())
+        if total_frames == 0:
+            return {team: 0.0 for team in self.teams}
+        return {team: num_frames / total_frames for team, num_frames in team_frames.items()}
+
+    def get_player_possession_frames(self, player_id, start=0, end=None):
+        start, end = self.clip_interval(start, end)
+        if player_id not in self.player_spell_indexes or start >= end:
+            return 0
+        return self.player_spell_indexes[player_id].get_total_length(start, end)
+
+    def count_events(self, event_type, start=0, end=None, team=None):
+        start, end = self.clip_interval(start, end)
+        event_frames = self.event_frames.get((event_type, team))
+        if event_frames is None or start >= end:
+            return 0
+        return int(np.searchsorted(event_frames, end, side='left') - np.searchsorted(event_frames, start, side='left'))
+
+    def get_events(self, start=0, end=None):
+        start, end = self.clip_interval(start, end)
+        first = int(np.searchsorted(self.all_event_frames, start, side='left'))
+        last = int(np.searchsorted(self.all_event_frames, end, side='left'))
+        return self.events[first:last]
+
+    def get_longest_spell(self, start=0, end=None, team=None):
+        start, end = self.clip_interval(start, end)
+        spell_index = self.spell_index if team is None else self.team_spell_indexes.get(team)
+        if spell_index is None or start >= end:
+            return None, 0
+        return spell_index.get_longest_spell(start, end)
+
+    def count_ball_lost_spells(self, start=0, end=None):
+        start, end = self.clip_interval(start, end)
+        if start >= end:
+            return 0
+        return self.ball_lost_index.count_spells(start, end)
+
+    def get_ball_lost_frames(self, start=0, end=None):
+        start, end = self.clip_interval(start, end)
+        if start >= end:
+            return 0
+        return self.ball_lost_index.get_total_length(start, end)
+
+    def get_summary(self, start=0, end=None):
+        possession_share = self.get_possession_share(start, end)
+        summary = []
+        for team in self.teams:
+            longest_player, longest_frames = self.get_longest_spell(start, end, team=team)
+            summary.append({
+                "team": team,
+                "possession_share": possession_share[team],
+                "passes": self.count_events("pass", start, end, team=team),
+                "interceptions": self.count_events("interception", start, end, team=team),
+                "longest_spell_player": longest_player,
+                "longest_spell_frames": longest_frames,
+            })
+        return summary
@@ -0,0 +1,108 @@
+import math
+import numpy as np ##type: ignore
+from scipy.spatial import cKDTree ##type: ignore
+
+## Nearest opponent, opponents within a radius and team compactness for every frame.
+## Every frame is shifted along x by more than its own extent, so a single KD-tree per team
+## answers the queries for all frames at once without ever matching across frames.
+class ProximityAnalyzer:
+    def __init__(self, pressure_radius=150, position_key="position_adjusted"):
+        self.pressure_radius = pressure_radius
+        self.position_key = position_key
+        self.teams = [1, 2]
+
+    def get_player_points(self, player_tracks):
+        player_ids, player_infos = [], []
+        for player_track in player_tracks:
+            player_ids.extend(player_track.keys())
+            player_infos.extend(player_track.values())
+
+        frame_nums = np.repeat(np.arange(len(player_tracks), dtype=np.int64),
+                               [len(player_track) for player_track in player_tracks])
+        teams = np.array([track.get("team", 0) for track in player_infos], dtype=np.int64)
+        points = np.array([track[self.position_key] for track in player_infos], dtype=np.float64).reshape(-1, 2)
+        has_ball = np.array([track.get("has_ball", False) for track in player_infos], dtype=bool)
+
+        return frame_nums, np.array(player_ids, dtype=np.int64), teams, points, has_ball
+
+    def get_team_compactness(self, frame_nums, teams, points, num_frames):
+        ## Mean distance of each team's players to their centroid, grouped by (frame, team)
+        valid = np.isin(teams, self.teams)
+        groups = frame_nums[valid] * len(self.teams) + np.searchsorted(self.teams, teams[valid])
+        team_points = points[valid]
+        num_groups = num_frames * len(self.teams)
+
+        counts = np.bincount(groups, minlength=num_groups)
+        safe_counts = np.maximum(counts, 1)
+        centroid_x = np.bincount(groups, weights=team_points[:, 0], minlength=num_groups) / safe_counts
+        centroid_y = np.bincount(groups, weights=team_points[:, 1], minlength=num_groups) / safe_counts
+
+        spread = np.hypot(team_points[:, 0] - centroid_x[groups], team_points[:, 1] - centroid_y[groups])
+        compactness = np.bincount(groups, weights=spread, minlength=num_groups) / safe_counts
+
+        compactness = np.where(counts > 0, compactness, np.nan).reshape(num_frames, len(self.teams)).tolist()
+        return [{team: None if math.isnan(value) else value for team, value in zip(self.teams, frame_compactness)}
+                for frame_compactness in compactness]
+
+    ## Per-frame {player_id: proximity} records, leaving the tracks untouched
+    def get_proximity(self, tracks):
+        num_frames = len(tracks['players'])
+        frame_nums, player_ids, teams, points, has_ball = self.get_player_points(tracks['players'])
+
+        nearest_opponents = np.full(len(player_ids), -1, dtype=np.int64)
+        nearest_distances = np.full(len(player_ids), np.inf)
+        opponents_nearby = np.zeros(len(player_ids), dtype=np.int64)
+
+        if len(points) > 0:
+            frame_spacing = 2 * (np.hypot(*np.ptp(points, axis=0)) + self.pressure_radius) + 1
+            indexed_points = np.column_stack([points[:, 0] + frame_nums * frame_spacing, points[:, 1]])
+
+            for team, opponent_team in zip(self.teams, self.teams[::-1]):
+                team_index = np.flatnonzero(teams == team)
+                opponent_index = np.flatnonzero(teams == opponent_team)
+                if len(team_index) == 0 or len(opponent_index) == 0:
+                    continue
+
+                ## Asking for as many neighbours as the most opponents in any frame returns every
+                ## opponent in the frame, sorted, so one query gives both nearest and nearby counts
+                max_opponents = np.bincount(frame_nums[opponent_index]).max()
+                opponent_tree = cKDTree(indexed_points[opponent_index])
+                distances, nearest = opponent_tree.query(indexed_points[team_index],
+                                                         k=max_opponents,
+                                                         distance_upper_bound=frame_spacing / 2)
+                distances = distances.reshape(len(team_index), -1)
+                nearest = nearest.reshape(len(team_index), -1)
+
+                found = np.isfinite(distances[:, 0])
+                nearest_opponents[team_index[found]] = player_ids[opponent_index[nearest[found, 0]]]
+                nearest_distances[team_index[found]] = distances[found, 0]
+                opponents_nearby[team_index] = (distances <= self.pressure_radius).sum(axis=1)
+
+        player_proximity = [{} for _ in range(num_frames)]
+        for frame_num, player_id, nearest_opponent, distance, nearby in zip(frame_nums.tolist(),
+                                                                            player_ids.tolist(),
+                                                                            nearest_opponents.tolist(),
+                                                                            nearest_distances.tolist(),
+                                                                            opponents_nearby.tolist()):
+            player_proximity[frame_num][player_id] = {
+                "nearest_opponent": nearest_opponent if nearest_opponent != -1 else None,
+                "nearest_opponent_distance": distance if distance != np.inf else None,
+                "opponents_within_radius": nearby,
+            }
+
+        ball_carrier_pressure = [None] * num_frames
+        for frame_num, nearby in zip(frame_nums[has_ball].tolist(), opponents_nearby[has_ball].tolist()):
+            ball_carrier_pressure[frame_num] = nearby
+
+        team_compactness = self.get_team_compactness(frame_nums, teams, points, num_frames)
+
+        return player_proximity, team_compactness, ball_carrier_pressure
+
+    ## Copies of the player dicts with their proximity merged in; the other objects are shared as is
+    def add_proximity_to_tracks(self, tracks, player_proximity):
+        analyzed_tracks = dict(tracks)
+        analyzed_tracks['players'] = [
+            {player_id: {**track, **frame_proximity.get(player_id, {})} for player_id, track in player_track.items()}
+            for player_track, frame_proximity in zip(tracks['players'], player_proximity)
+        ]
+        return analyzed_tracks
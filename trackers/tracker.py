@@ -12,6 +12,9 @@ class Tracker:
         self.model = YOLO(model_path)
         self.tracker = sv.ByteTrack()
 
+    def reset_tracker(self):
+        self.tracker = sv.ByteTrack()
+
     def add_position_to_tracks(self, tracks):
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
@@ -42,14 +45,15 @@ class Tracker:
             detections += detections_batch
         return detections
 
-    def get_object_tracks(self, frames, read_from_stubs=False, stubs_path=None):
+    def get_object_tracks(self, frames, read_from_stubs=False, stubs_path=None, detections=None):
 
         if read_from_stubs and stubs_path is not None and os.path.exists(stubs_path):
             with open(stubs_path, 'rb') as f:
                 tracks = pickle.load(f)
             return tracks
 
-        detections = self.detect_frames(frames)
+        if detections is None:
+            detections = self.detect_frames(frames)
 
         tracks={
             "players": [],
@@ -162,26 +166,22 @@ class Tracker:
     
         return frame
 
-    def draw_team_ball_control(self, frame, frame_num, team_ball_control):
+    def draw_team_ball_control(self, frame, frame_num, possession_timeline):
         overlay = frame.copy()
         cv2.rectangle(overlay, (1350, 850), (1900, 970), (255, 255, 255), cv2.FILLED)
         alpha = 0.4
         cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
 
-        team_ball_control_till_frame = team_ball_control[:frame_num + 1]
-
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 2].shape[0]
-
-        team_1 = team_1_num_frames / (team_1_num_frames + team_2_num_frames)
-        team_2 = team_2_num_frames / (team_1_num_frames + team_2_num_frames)
+        possession_share = possession_timeline.get_possession_share(0, frame_num + 1)
+        team_1 = possession_share[1]
+        team_2 = possession_share[2]
 
         cv2.putText(frame, f"Team 1 Ball Control : {team_1*100:.2f} %", (1360, 900), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
         cv2.putText(frame, f"Team 2 Ball Control : {team_2*100:.2f} %", (1360, 950), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
 
         return frame
 
-    def draw_annotations(self, video_frames, tracks, team_ball_control):
+    def draw_annotations(self, video_frames, tracks, possession_timeline):
         output_video_frames = []
 
         for frame_num, frame in enumerate(video_frames):
@@ -200,6 +200,11 @@ class Tracker:
                 if player.get("has_ball", False):
                     frame = self.draw_traiangle(frame, player['bbox'], (0, 0, 255))
 
+                    ## Opponents pressing the ball carrier
+                    if player.get("opponents_within_radius") is not None:
+                        x, _ = get_centre_of_bbbox(player['bbox'])
+                        cv2.putText(frame, f"{player['opponents_within_radius']}", (int(x) + 12, int(player['bbox'][1]) - 12), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+
 
             # Draw Referee
             for track_id, referee in referee_dict.items():
@@ -212,7 +217,7 @@ class Tracker:
                 frame = self.draw_traiangle(frame, bbox, (0, 255, 0))
 
             # Draw Team Ball Control
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
+            frame = self.draw_team_ball_control(frame, frame_num, possession_timeline)
 
             output_video_frames.append(frame)
         return output_video_frames
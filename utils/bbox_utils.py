@@ -13,4 +13,18 @@ def measure_xy_distance(p1, p2):
 
 def get_foot_position(bbox):
     x1, y1, x2, y2 = bbox
-    return int((x1 + x2) / 2), y2
\ No newline at end of file
+    return int((x1 + x2) / 2), y2
+
+def get_bbox_iou(bbox1, bbox2):
+    x1 = max(bbox1[0], bbox2[0])
+    y1 = max(bbox1[1], bbox2[1])
+    x2 = min(bbox1[2], bbox2[2])
+    y2 = min(bbox1[3], bbox2[3])
+
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    if intersection == 0:
+        return 0.0
+
+    area1 = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
+    area2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
+    return intersection / (area1 + area2 - intersection)
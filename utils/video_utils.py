@@ -1,14 +1,36 @@
 import cv2 #type: ignore
 import os
 
-def read_video(video_path):
+def get_video_frame_count(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Cannot open video file {video_path}")
+        return 0
+
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return frame_count
+
+
+def read_video(video_path, start_frame=0, end_frame=None):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: Cannot open video file {video_path}")
         return []
-    
+
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+        ## Seeking is not frame accurate for every codec, so decode up to the start frame instead
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start_frame:
+            cap.release()
+            cap = cv2.VideoCapture(video_path)
+            for _ in range(start_frame):
+                if not cap.grab():
+                    break
+
     frames = []
-    while True:
+    while end_frame is None or start_frame + len(frames) < end_frame:
         ret, frame = cap.read()
         if not ret:
             break
@@ -0,0 +1,429 @@
+import json
+import multiprocessing
+import os
+import pickle
+import socket
+import sys
+import threading
+import time
+import uuid
+import numpy as np ##type: ignore
+from scipy.optimize import linear_sum_assignment ##type: ignore
+from utils.video_utils import read_video, get_video_frame_count
+from utils.bbox_utils import get_bbox_iou
+from trackers.tracker import Tracker
+from team_assigner.team_assigner import TeamAssigner
+from camera_movement_estimator.camera_movement_estimator import CameraMovementEstimator
+
+## Tracks overlapping segments of one video on separate workers sharing `shared_dir`,
+## then stitches the segment track IDs together using IoU over the overlap and shirt colour
+class VideoSharder:
+    def __init__(self, model_path, shared_dir, segment_length=750, overlap=50, lock_timeout=600):
+        if overlap < 1 or segment_length <= overlap:
+            raise ValueError("segment_length must be greater than overlap, and overlap at least 1 frame")
+
+        self.model_path = model_path
+        self.shared_dir = shared_dir
+        self.segment_length = segment_length
+        self.overlap = overlap
+        self.lock_timeout = lock_timeout
+        self.poll_interval = 5
+
+        self.iou_threshold = 0.3
+        self.color_weight = 0.5
+        self.color_sample_step = 5
+        self.max_color_distance = (3 * 255 ** 2) ** 0.5
+
+    def get_manifest_path(self):
+        return os.path.join(self.shared_dir, "manifest.json")
+
+    def get_segment_path(self, segment_index, suffix):
+        return os.path.join(self.shared_dir, f"segment_{segment_index}.{suffix}")
+
+    def get_segments(self, num_frames):
+        segments = []
+        start = 0
+        while start < num_frames:
+            end = min(start + self.segment_length, num_frames)
+            segments.append([start, end])
+            if end == num_frames:
+                break
+            start = end - self.overlap
+        return segments
+
+    def load_manifest(self):
+        with open(self.get_manifest_path(), 'r') as f:
+            return json.load(f)
+
+    def get_missing_segments(self, manifest):
+        return [segment_index for segment_index in range(len(manifest["segments"]))
+                if not os.path.exists(self.get_segment_path(segment_index, "pkl"))]
+
+    def remove_lock(self, segment_index):
+        try:
+            os.remove(self.get_segment_path(segment_index, "lock"))
+        except FileNotFoundError:
+            pass
+
+    def prepare(self, video_path, num_frames=None):
+        os.makedirs(self.shared_dir, exist_ok=True)
+
+        ## CAP_PROP_FRAME_COUNT is only an estimate, so callers that decoded the video pass the real count
+        if num_frames is None:
+            num_frames = get_video_frame_count(video_path)
+
+        video_stat = os.stat(video_path)
+        manifest = {
+            "video_path": os.path.abspath(video_path),
+            "video_size": video_stat.st_size,
+            "video_mtime": video_stat.st_mtime,
+            "model_path": os.path.abspath(self.model_path),
+            "num_frames": num_frames,
+            "overlap": self.overlap,
+            "lock_timeout": self.lock_timeout,
+            "segments": self.get_segments(num_frames),
+        }
+
+        ## Keep finished segments of an identical earlier run, drop anything else
+        if os.path.exists(self.get_manifest_path()):
+            previous_manifest = self.load_manifest()
+            run_id = previous_manifest.pop("run_id", None)
+            if previous_manifest == manifest:
+                ## Only expired leases are dropped, live ones may belong to workers on other machines
+                for segment_index in self.get_missing_segments(manifest):
+                    if self.is_lock_stale(self.get_segment_path(segment_index, "lock")):
+                        self.remove_lock(segment_index)
+                manifest["run_id"] = run_id
+                return manifest
+
+        ## Results carry the run id, so a worker still on an older manifest cannot slip one in
+        manifest["run_id"] = uuid.uuid4().hex
+
+        for file_name in os.listdir(self.shared_dir):
+            if file_name.startswith("segment_"):
+                os.remove(os.path.join(self.shared_dir, file_name))
+
+        temp_path = self.get_manifest_path() + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.get_manifest_path())
+
+        return manifest
+
+    def is_lock_stale(self, lock_path):
+        try:
+            return time.time() - os.path.getmtime(lock_path) > self.lock_timeout
+        except FileNotFoundError:
+            return False
+
+    def claim_segment(self, segment_index):
+        lock_path = self.get_segment_path(segment_index, "lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self.is_lock_stale(lock_path):
+                return False
+
+            ## The lease ran out; only one worker wins the rename of the stale lock
+            stale_path = f"{lock_path}.stale.{socket.gethostname()}.{os.getpid()}"
+            try:
+                os.rename(lock_path, stale_path)
+            except FileNotFoundError:
+                return False
+
+            if not self.is_lock_stale(stale_path):
+                ## Another worker reclaimed it first, hand its fresh lock back
+                os.rename(stale_path, lock_path)
+                return False
+
+            os.remove(stale_path)
+            return self.claim_segment(segment_index)
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{socket.gethostname()}:{os.getpid()}")
+        return True
+
+    def start_heartbeat(self, segment_index):
+        ## Keeps touching the lock so other workers know the lease is still held
+        stopped = threading.Event()
+        lock_path = self.get_segment_path(segment_index, "lock")
+
+        def beat():
+            while not stopped.wait(self.lock_timeout / 4):
+                try:
+                    os.utime(lock_path)
+                except FileNotFoundError:
+                    return
+
+        threading.Thread(target=beat, daemon=True).start()
+        return stopped
+
+    def run_worker(self):
+        manifest = self.load_manifest()
+        if os.path.abspath(self.model_path) != manifest["model_path"]:
+            raise RuntimeError(f"Worker model {os.path.abspath(self.model_path)} does not match "
+                               f"the manifest model {manifest['model_path']}")
+
+        ## Leases must expire on the same schedule for every worker
+        self.lock_timeout = manifest["lock_timeout"]
+        tracker = None
+
+        for segment_index in range(len(manifest["segments"])):
+            if os.path.exists(self.get_segment_path(segment_index, "pkl")):
+                continue
+            if not self.claim_segment(segment_index):
+                continue
+
+            heartbeat = self.start_heartbeat(segment_index)
+            try:
+                ## Load the model once per worker, tracking state is reset per segment
+                if tracker is None:
+                    tracker = Tracker(self.model_path)
+                self.process_segment(manifest, segment_index, tracker)
+            except BaseException:
+                self.remove_lock(segment_index)
+                raise
+            finally:
+                heartbeat.set()
+
+    def process_segment(self, manifest, segment_index, tracker):
+        start, end = manifest["segments"][segment_index]
+        frames = read_video(manifest["video_path"], start_frame=start, end_frame=end)
+        if len(frames) != end - start:
+            raise RuntimeError(f"Segment {segment_index} expected {end - start} frames from {start} "
+                               f"but read {len(frames)} from {manifest['video_path']}")
+
+        tracker.reset_tracker()
+        tracks = tracker.get_object_tracks(frames, read_from_stubs=False)
+
+        camera_movement_estimator = CameraMovementEstimator(frames[0])
+        camera_movements = camera_movement_estimator.get_camera_movement(frames, read_from_stubs=False)
+
+        ## Shirt colours are only needed where segments overlap
+        overlap = manifest["overlap"]
+        head_colors = {}
+        tail_colors = {}
+        if start > 0:
+            head_colors = self.get_track_colors(frames, tracks["players"], 0, overlap)
+        if end < manifest["num_frames"]:
+            tail_colors = self.get_track_colors(frames, tracks["players"], len(frames) - overlap, len(frames))
+
+        segment = {
+            "run_id": manifest["run_id"],
+            "start": start,
+            "end": end,
+            "tracks": tracks,
+            "camera_movements": camera_movements,
+            "head_colors": head_colors,
+            "tail_colors": tail_colors,
+        }
+
+        if self.load_manifest()["run_id"] != manifest["run_id"]:
+            print(f"Manifest changed while processing segment {segment_index}, discarding its result")
+            self.remove_lock(segment_index)
+            return
+
+        result_path = self.get_segment_path(segment_index, "pkl")
+        with open(result_path + ".tmp", 'wb') as f:
+            pickle.dump(segment, f)
+        os.replace(result_path + ".tmp", result_path)
+
+    def get_track_colors(self, frames, player_tracks, start, end):
+        team_assigner = TeamAssigner()
+        track_colors = {}
+
+        for frame_num in range(max(start, 0), min(end, len(frames)), self.color_sample_step):
+            for track_id, track in player_tracks[frame_num].items():
+                x1, y1, x2, y2 = track["bbox"]
+                if int(y2) - int(y1) < 4 or int(x2) - int(x1) < 2:
+                    continue
+                player_color = team_assigner.get_player_color(frames[frame_num], track["bbox"])
+                track_colors.setdefault(track_id, []).append(player_color)
+
+        return {track_id: np.mean(colors, axis=0) for track_id, colors in track_colors.items()}
+
+    def match_tracks(self, previous, segment, object):
+        overlap_start = segment["start"]
+        overlap_end = previous["end"]
+
+        previous_ids = sorted({track_id for frame_num in range(overlap_start, overlap_end)
+                               for track_id in previous["tracks"][object][frame_num - previous["start"]]})
+        current_ids = sorted({track_id for frame_num in range(overlap_start, overlap_end)
+                              for track_id in segment["tracks"][object][frame_num - segment["start"]]})
+        if not previous_ids or not current_ids:
+            return {}
+
+        previous_index = {track_id: i for i, track_id in enumerate(previous_ids)}
+        current_index = {track_id: j for j, track_id in enumerate(current_ids)}
+
+        iou_sum = np.zeros((len(previous_ids), len(current_ids)))
+        both_present = np.zeros((len(previous_ids), len(current_ids)))
+        previous_present = np.zeros(len(previous_ids))
+        current_present = np.zeros(len(current_ids))
+
+        for frame_num in range(overlap_start, overlap_end):
+            previous_frame = previous["tracks"][object][frame_num - previous["start"]]
+            current_frame = segment["tracks"][object][frame_num - segment["start"]]
+
+            for previous_id in previous_frame:
+                previous_present[previous_index[previous_id]] += 1
+            for current_id in current_frame:
+                current_present[current_index[current_id]] += 1
+
+            for previous_id, previous_track in previous_frame.items():
+                for current_id, current_track in current_frame.items():
+                    i, j = previous_index[previous_id], current_index[current_id]
+                    iou_sum[i, j] += get_bbox_iou(previous_track["bbox"], current_track["bbox"])
+                    both_present[i, j] += 1
+
+        ## Average over every overlap frame either track appears in, so brief co-occurrences score low
+        either_present = previous_present[:, None] + current_present[None, :] - both_present
+        mean_iou = iou_sum / np.maximum(either_present, 1)
+
+        cost = 1 - mean_iou
+        if object == "players":
+            for previous_id, i in previous_index.items():
+                for current_id, j in current_index.items():
+                    previous_color = previous["tail_colors"].get(previous_id)
+                    current_color = segment["head_colors"].get(current_id)
+                    if previous_color is None or current_color is None:
+                        continue
+                    color_distance = np.linalg.norm(previous_color - current_color) / self.max_color_distance
+                    cost[i, j] += self.color_weight * color_distance
+
+        cost[mean_iou < self.iou_threshold] = 1e6
+        rows, cols = linear_sum_assignment(cost)
+
+        return {current_ids[j]: previous_ids[i] for i, j in zip(rows, cols) if mean_iou[i, j] >= self.iou_threshold}
+
+    def merge_segments(self):
+        manifest = self.load_manifest()
+
+        missing = self.get_missing_segments(manifest)
+        if missing:
+            raise RuntimeError(f"Segments not processed yet: {missing}")
+
+        tracks = {
+            "players": [],
+            "ball": [],
+            "referee": [],
+        }
+        camera_movements = []
+
+        next_track_id = 1
+        previous = None
+        previous_id_maps = {}
+
+        for segment_index, (start, end) in enumerate(manifest["segments"]):
+            with open(self.get_segment_path(segment_index, "pkl"), 'rb') as f:
+                segment = pickle.load(f)
+
+            if segment.get("run_id") != manifest["run_id"]:
+                raise RuntimeError(f"Segment {segment_index} was written for another run of {manifest['video_path']}")
+
+            if segment["start"] != start or segment["end"] != end or len(segment["camera_movements"]) != end - start:
+                raise RuntimeError(f"Segment {segment_index} covers frames {segment['start']}-{segment['end']} "
+                                   f"with {len(segment['camera_movements'])} frames, manifest expects {start}-{end}")
+
+            ## The first segment keeps its own track IDs, later ones map onto them
+            id_maps = {}
+            if previous is None:
+                for object in ("players", "referee"):
+                    id_maps[object] = {track_id: track_id for frame_tracks in segment["tracks"][object]
+                                       for track_id in frame_tracks}
+                next_track_id = int(max([track_id for id_map in id_maps.values() for track_id in id_map], default=0)) + 1
+            else:
+                for object in ("players", "referee"):
+                    matches = self.match_tracks(previous, segment, object)
+                    id_maps[object] = {current_id: previous_id_maps[object][previous_id]
+                                       for current_id, previous_id in matches.items()}
+
+                    for frame_tracks in segment["tracks"][object]:
+                        for track_id in frame_tracks:
+                            if track_id not in id_maps[object]:
+                                id_maps[object][track_id] = next_track_id
+                                next_track_id += 1
+
+            ## Switch over to this segment halfway through the overlap
+            cut = start
+            if previous is not None:
+                cut = (start + previous["end"]) // 2
+                for object in tracks:
+                    del tracks[object][cut:]
+                del camera_movements[cut:]
+
+            for frame_num in range(cut - start, end - start):
+                for object in ("players", "referee"):
+                    frame_tracks = segment["tracks"][object][frame_num]
+                    tracks[object].append({id_maps[object][track_id]: track for track_id, track in frame_tracks.items()})
+                tracks["ball"].append(segment["tracks"]["ball"][frame_num])
+                camera_movements.append(segment["camera_movements"][frame_num])
+
+            previous = segment
+            previous_id_maps = id_maps
+
+        if len(camera_movements) != manifest["num_frames"]:
+            raise RuntimeError(f"Merged {len(camera_movements)} frames, expected {manifest['num_frames']}")
+
+        return tracks, camera_movements
+
+    def process_video(self, video_path, num_workers=2, num_frames=None):
+        manifest = self.prepare(video_path, num_frames=num_frames)
+
+        context = multiprocessing.get_context("spawn")
+        workers = [context.Process(target=self.run_worker) for _ in range(num_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        failed_workers = [f"{worker.name} (pid {worker.pid}, exit code {worker.exitcode})"
+                          for worker in workers if worker.exitcode != 0]
+
+        ## Our workers have all exited, so locks they left behind are dead and can go right away
+        worker_locks = {f"{socket.gethostname()}:{worker.pid}" for worker in workers}
+        for segment_index in self.get_missing_segments(manifest):
+            try:
+                with open(self.get_segment_path(segment_index, "lock"), 'r') as f:
+                    if f.read() in worker_locks:
+                        self.remove_lock(segment_index)
+            except FileNotFoundError:
+                pass
+
+        ## Redo free segments here and wait on those leased by workers on other machines,
+        ## reclaiming any whose lease runs out
+        missing = self.get_missing_segments(manifest)
+        retried = False
+        while missing:
+            try:
+                self.run_worker()
+            except Exception as error:
+                raise RuntimeError(f"Reprocessing segments {missing} locally failed, "
+                                   f"failed workers: {failed_workers}") from error
+
+            missing = self.get_missing_segments(manifest)
+            leased = [segment_index for segment_index in missing
+                      if os.path.exists(self.get_segment_path(segment_index, "lock"))]
+            if missing and not leased:
+                ## A remote worker may have given up its lease just now, so try once more before failing
+                if retried:
+                    raise RuntimeError(f"Segments {missing} were not processed, failed workers: {failed_workers}")
+                retried = True
+                continue
+
+            retried = False
+            if missing:
+                time.sleep(self.poll_interval)
+
+        return self.merge_segments()
+
+
+if __name__ == "__main__":
+    ## Extra workers on other machines: python -m video_sharder.video_sharder <shared_dir> [model_path]
+    ## The model defaults to the one in the manifest, a different one is refused
+    shared_dir = sys.argv[1]
+    with open(os.path.join(shared_dir, "manifest.json"), 'r') as f:
+        model_path = json.load(f)["model_path"]
+    if len(sys.argv) > 2:
+        model_path = sys.argv[2]
+    VideoSharder(model_path=model_path, shared_dir=shared_dir).run_worker()